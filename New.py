@@ -1,12 +1,23 @@
 import streamlit as st
-import PyPDF2
-import io
 import os
 import json
-from openai import OpenAI
+import hashlib
+import html
+from concurrent.futures import ThreadPoolExecutor
+from openai import BadRequestError, NotFoundError, OpenAI
 from typing import List
-from pdf_context import find_context_matches
+from pdf_context import build_page_index, extract_page_texts, find_context_matches, sentence_index
 from auth import verify_user, create_user, list_users
+from llm_cache import cache_key, get_cached, put_cached
+from file_cache import get_file_id, remember_file_id
+from batch_queue import collect_results, pending_batches, queue_request, queued_count, submit_queued
+
+try:
+    from fpdf import FPDF  # lightweight PDF builder
+    _FPDF_ERR = None
+except Exception as e:
+    FPDF = None
+    _FPDF_ERR = str(e)
 
 
 # OpenAI setup: expects OPENAI_API_KEY in env vars
@@ -280,6 +291,19 @@ POLICY_JSON = r'''{
   ]
 }'''
 
+
+@st.cache_resource
+def _load_policy() -> dict:
+    """Parse POLICY_JSON once per process instead of on every Streamlit rerun."""
+    return json.loads(POLICY_JSON)
+
+
+@st.cache_resource
+def _policy_prompt_text() -> str:
+    """Compact policy text sent to the model (indentation whitespace only costs tokens)."""
+    return json.dumps(_load_policy(), separators=(",", ":"), ensure_ascii=False)
+
+
 # Interactive API key input if not set in environment
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-5")
@@ -387,25 +411,66 @@ st.markdown(
     unsafe_allow_html=True,
 )
 
+_BADGE_HTML = {
+    "correct": "<span class='badge badge-correct'>Correct</span>",
+    "insufficient": "<span class='badge badge-insufficient'>Insufficient</span>",
+}
+_DEFAULT_BADGE_HTML = "<span class='badge badge-incorrect'>Incorrect</span>"
+
+# Finding status badges used by the results view
+_STATUS_BADGES = {
+    "incorrect": "<span class='badge badge-incorrect'>Incorrect</span>",
+    "insufficient": "<span class='badge badge-insufficient'>Insufficient</span>",
+    "aligned": "<span class='badge badge-correct'>Aligned</span>",
+}
+
+
 def _render_badge(verdict: str) -> str:
-    v = (verdict or "").lower()
-    if v == "correct":
-        cls = "badge badge-correct"
-        label = "Correct"
-    elif v == "insufficient":
-        cls = "badge badge-insufficient"
-        label = "Insufficient"
-    else:
-        cls = "badge badge-incorrect"
-        label = "Incorrect"
-    return f"<span class='{cls}'>{label}</span>"
+    return _BADGE_HTML.get((verdict or "").lower(), _DEFAULT_BADGE_HTML)
+
+
+def _esc(text) -> str:
+    # model output goes into raw HTML; a blank line would also end the HTML block in markdown
+    return html.escape(str(text)).replace("\n", "<br>")
+
+
+def _finding_html(f: dict) -> str:
+    """Render one finding as a single self-contained card."""
+    status = (f.get("status") or "").lower()
+    badge = _STATUS_BADGES.get(status, f"<span class='small-muted'>{_esc(status or 'Unknown')}</span>")
+    parts = [f"<div class='card'><div class='claim-header'>{badge} &nbsp; <strong>{_esc(f.get('oasis_claim', ''))}</strong></div>"]
+    issue = f.get("issue")
+    policy_refs = f.get("policy_refs")
+    citations = f.get("citations")
+    suggestion = f.get("suggestion")
+    if issue:
+        parts.append(f"<p>Issue: {_esc(issue)}</p>")
+    if policy_refs:
+        parts.append(f"<p>Policy refs: {_esc(', '.join(policy_refs))}</p>")
+    if citations:
+        parts.append("<p><strong>Citations:</strong></p>")
+        for c in citations:
+            src = _esc(c.get("file", ""))
+            page = _esc(c.get("page", ""))
+            text = _esc(c.get("text", ""))
+            parts.append(f"<div class='evidence'><strong>Source:</strong> {src} &nbsp; <span class='small-muted'>Page {page}</span><div>{text}</div></div>")
+    if suggestion:
+        parts.append(f"<p>Suggestion: {_esc(suggestion)}</p>")
+    parts.append("</div>")
+    return "".join(parts)
 
 # Create a default user for convenience if it doesn't exist yet
-try:
-    create_user("Chaitanya", "Password@123")
-except Exception:
-    # ignore if user already exists or other creation error
-    pass
+@st.cache_resource
+def _ensure_default_user():
+    # runs once per process rather than on every rerun
+    try:
+        create_user("Chaitanya", "Password@123")
+    except Exception:
+        # ignore if user already exists or other creation error
+        pass
+
+
+_ensure_default_user()
 
 # Sidebar: simple login/register UI
 st.sidebar.header("Account")
@@ -444,49 +509,65 @@ else:
             st.sidebar.error(f"Failed to reset default user: {e}")
 
 
-def extract_pdf_texts(uploaded_file) -> tuple:
-    """Return (PdfReader, list of page texts) for uploaded PDF."""
-    file_bytes = uploaded_file.read()
-    reader = PyPDF2.PdfReader(io.BytesIO(file_bytes))
-    page_texts = []
-    for i in range(len(reader.pages)):
-        try:
-            text = reader.pages[i].extract_text() or ""
-        except Exception:
-            text = ""
-        page_texts.append(text)
-    return reader, page_texts
+def _content_key(data: bytes) -> str:
+    """Stable cache key for file contents (blake2b: fast, no crypto requirement here)."""
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
 
+# bounded: every distinct upload from any session would otherwise stay in memory until restart
+@st.cache_data(show_spinner=False, max_entries=64)
+def _parse_pdf_bytes(file_key: str, _file_bytes: bytes) -> list:
+    # Streamlit skips hashing underscore-prefixed args; file_key already identifies the bytes.
+    # Only the page texts are cached: pdfium documents are opened and closed per call.
+    return extract_page_texts(_file_bytes)
 
-def build_pdf_info(reader, page_texts):
-    return {"reader": reader, "pages": len(page_texts), "page_texts": page_texts}
+
+def extract_pdf_texts(uploaded_file) -> list:
+    """Return the list of page texts for uploaded PDF.
+
+    Cached by content hash, so reruns with the same upload skip parsing.
+    """
+    # getvalue() returns the whole buffer regardless of the read position, unlike read()
+    file_bytes = uploaded_file.getvalue()
+    return _parse_pdf_bytes(_content_key(file_bytes), file_bytes)
+
+
+def build_pdf_info(page_texts):
+    joined_lower, page_offsets = build_page_index(page_texts)
+    sentence_starts, page_first_sentence = sentence_index(joined_lower, page_offsets)
+    return {
+        "pages": len(page_texts),
+        "page_texts": page_texts,
+        "joined_lower": joined_lower,
+        "page_offsets": page_offsets,
+        "sentence_starts": sentence_starts,
+        "page_first_sentence": page_first_sentence,
+    }
 
 
 def _build_pdf_report(case_result: dict) -> tuple:
     """Build a simple PDF from the case_result. Returns (bytes or None, error_or_none)."""
-    try:
-        from fpdf import FPDF  # lightweight PDF builder
-    except Exception as e:
-        return None, f"PDF export unavailable (fpdf not installed: {e})"
+    if FPDF is None:
+        return None, f"PDF export unavailable (fpdf2 not installed: {_FPDF_ERR})"
 
     pdf = FPDF()
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
 
     def _safe(text: str) -> str:
-        # FPDF default fonts are latin-1; replace unsupported chars to avoid encode errors
+        # core PDF fonts are latin-1; replace unsupported chars to avoid encode errors
         return (text or "").encode("latin-1", "replace").decode("latin-1")
 
-    pdf.set_font("Arial", "B", 14)
-    pdf.cell(0, 10, _safe("OASIS vs Referral Audit"), ln=True)
+    pdf.set_font("Helvetica", "B", 14)
+    pdf.cell(0, 10, _safe("OASIS vs Referral Audit"), new_x="LMARGIN", new_y="NEXT")
 
     def add_heading(text):
-        pdf.set_font("Arial", "B", 12)
-        pdf.cell(0, 8, _safe(text), ln=True)
-        pdf.set_font("Arial", "", 11)
+        pdf.set_font("Helvetica", "B", 12)
+        pdf.cell(0, 8, _safe(text), new_x="LMARGIN", new_y="NEXT")
+        pdf.set_font("Helvetica", "", 11)
 
     def add_text(text):
-        pdf.multi_cell(0, 6, _safe(text))
+        pdf.multi_cell(0, 6, _safe(text), new_x="LMARGIN", new_y="NEXT")
 
     overall = case_result.get("overall_score")
     summary = case_result.get("summary", "")
@@ -505,29 +586,165 @@ def _build_pdf_report(case_result: dict) -> tuple:
             status = f.get("status", "")
             claim = f.get("oasis_claim", "")
             issue = f.get("issue", "")
-            pdf.set_font("Arial", "B", 11)
-            pdf.cell(0, 7, _safe(f"{idx}. [{status}] {claim}"), ln=True)
-            pdf.set_font("Arial", "", 11)
+            pdf.set_font("Helvetica", "B", 11)
+            pdf.cell(0, 7, _safe(f"{idx}. [{status}] {claim}"), new_x="LMARGIN", new_y="NEXT")
+            pdf.set_font("Helvetica", "", 11)
+            policy_refs = f.get("policy_refs")
+            citations = f.get("citations")
+            suggestion = f.get("suggestion")
             if issue:
                 add_text(f"Issue: {issue}")
-            if f.get("policy_refs"):
-                add_text("Policy refs: " + ", ".join(f.get("policy_refs")))
-            if f.get("citations"):
+            if policy_refs:
+                add_text("Policy refs: " + ", ".join(policy_refs))
+            if citations:
                 add_text("Citations:")
-                for c in f.get("citations"):
+                for c in citations:
                     src = c.get("file", "")
                     page = c.get("page", "")
                     text = c.get("text", "")
                     add_text(f" - {src} p.{page}: {text}")
-            if f.get("suggestion"):
-                add_text(f"Suggestion: {f.get('suggestion')}")
+            if suggestion:
+                add_text(f"Suggestion: {suggestion}")
             pdf.ln(2)
 
     if recs:
         add_heading("Recommended actions")
-        add_text(recs if isinstance(recs, str) else json.dumps(recs, ensure_ascii=False))
+        if isinstance(recs, list):
+            add_text("\n".join(f"- {r}" for r in recs))
+        else:
+            add_text(recs if isinstance(recs, str) else json.dumps(recs, ensure_ascii=False))
+
+    # fpdf2 returns the finished document as a bytearray; no second encode pass needed
+    return bytes(pdf.output()), None
+
+
+# Shared by the analysis and follow-up prompts; must not contain per-turn values
+ANALYSIS_SYSTEM_RULES = (
+    "You are an auditor for OASIS/home health documentation. You have: (a) the OASIS PDF (claims), "
+    "(b) one or more Referral/Supporting PDFs (source of truth), and (c) a policy JSON from Medicare Benefit Policy Manual Chapter 7."
+)
+
+ANALYSIS_INSTRUCTION = (
+    "Task: cross-check the OASIS against referrals, applying the policy JSON. Identify incorrect or insufficient claims in OASIS, cite referral evidence (and policy sections), and suggest concrete fixes.\n\n"
+    "Return EXACTLY one JSON object with keys:\n"
+    "- overall_score: integer 0-100 reflecting compliance\n"
+    "- summary: short overview (1-3 sentences)\n"
+    "- findings: list of objects {status: 'Incorrect'|'Insufficient'|'Aligned', oasis_claim, issue, policy_refs: [strings], citations: [ {file: 'oasis'|'referral'|'policy', page: integer (policy use 0), text: string} ], suggestion: string}\n"
+    "- recommended_actions: short list of prioritized remediation steps\n"
+    "Keep citations concise; avoid raw PDF dumps."
+)
+
+# Structured-output schema for the analysis; the model's reply is guaranteed to match it
+ANALYSIS_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "overall_score": {"type": "integer"},
+        "summary": {"type": "string"},
+        "findings": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "status": {"type": "string", "enum": ["Incorrect", "Insufficient", "Aligned"]},
+                    "oasis_claim": {"type": "string"},
+                    "issue": {"type": "string"},
+                    "policy_refs": {"type": "array", "items": {"type": "string"}},
+                    "citations": {
+                        "type": "array",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "file": {"type": "string", "enum": ["oasis", "referral", "policy"]},
+                                "page": {"type": "integer"},
+                                "text": {"type": "string"},
+                            },
+                            "required": ["file", "page", "text"],
+                            "additionalProperties": False,
+                        },
+                    },
+                    "suggestion": {"type": "string"},
+                },
+                "required": ["status", "oasis_claim", "issue", "policy_refs", "citations", "suggestion"],
+                "additionalProperties": False,
+            },
+        },
+        "recommended_actions": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": ["overall_score", "summary", "findings", "recommended_actions"],
+    "additionalProperties": False,
+}
+
+
+def _prompt_content(file_inputs: list, turn_text: str) -> list:
+    """Content blocks for a case prompt: policy and shared rules, then the files, then turn_text.
 
-    return pdf.output(dest="S").encode("latin-1", "replace"), None
+    Everything before turn_text is byte-identical for a given upload set, so repeated
+    analyses of a case, and full-context follow-ups among themselves, can reuse a cached
+    prefix. Analysis calls do not share one with follow-ups: OpenAI places the analysis's
+    structured-output schema ahead of the messages.
+    """
+    return [
+        {"type": "input_text", "text": _policy_prompt_text()},
+        {"type": "input_text", "text": ANALYSIS_SYSTEM_RULES},
+    ] + file_inputs + [{"type": "input_text", "text": turn_text}]
+
+
+def _analysis_request(file_inputs: list) -> dict:
+    """Request body for the analysis call (shared by the live call and the batch queue)."""
+    return {
+        "model": OPENAI_MODEL,
+        "input": [
+            {
+                "role": "user",
+                "content": _prompt_content(file_inputs, ANALYSIS_INSTRUCTION),
+            }
+        ],
+        "text": {"format": {"type": "json_schema", "name": "oasis_audit", "schema": ANALYSIS_SCHEMA, "strict": True}},
+    }
+
+
+def _analysis_cache_key(file_id_oasis: str, file_id_referrals: list) -> str:
+    # any change to the model, policy or prompt text yields a new key
+    return cache_key(
+        "analysis", OPENAI_MODEL, _policy_prompt_text(), ANALYSIS_SYSTEM_RULES, ANALYSIS_INSTRUCTION,
+        json.dumps(ANALYSIS_SCHEMA, sort_keys=True), file_id_oasis, *sorted(file_id_referrals),
+    )
+
+
+# bounded like _parse_pdf_bytes: every distinct case result would otherwise keep its PDF bytes
+@st.cache_data(show_spinner=False, max_entries=64)
+def _cached_pdf_report(case_hash: str, _case_result: dict) -> tuple:
+    # keyed by case_hash only; reruns (e.g. chat submits) reuse the built PDF
+    return _build_pdf_report(_case_result)
+
+
+_JSON_DECODER = json.JSONDecoder()
+
+
+def _stream_findings(buf: str, pos: int, found: list) -> int:
+    """Decode finding objects that have fully arrived in a partial analysis response.
+
+    `pos` is where the previous call stopped (0 before the findings array has been seen).
+    Complete findings are appended to `found`; returns the position to resume from.
+    """
+    if pos == 0:
+        key = buf.find('"findings"')
+        bracket = buf.find("[", key) if key != -1 else -1
+        if bracket == -1:
+            return 0
+        pos = bracket + 1
+    while True:
+        while pos < len(buf) and buf[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(buf) or buf[pos] != "{":
+            return pos
+        try:
+            obj, end = _JSON_DECODER.raw_decode(buf, pos)
+        except ValueError:
+            # object not complete yet
+            return pos
+        found.append(obj)
+        pos = end
 
 
 def main():
@@ -596,30 +813,52 @@ def main():
         st.warning("OpenAI API key not set - enter it in the sidebar to enable GPT queries.")
         return
 
-    # Upload both PDFs to OpenAI Files API (if not already uploaded in session)
+    # Upload both PDFs to OpenAI Files API (if not already uploaded in session).
+    # Keyed by content hash, so replacing a file re-uploads it and re-adding an old one does not.
     if "openai_file_ids" not in st.session_state:
         st.session_state.openai_file_ids = {}
 
-    # helper to upload and cache file_id
-    def _upload_to_openai(key_name, file_obj):
-        if key_name in st.session_state.openai_file_ids:
-            return st.session_state.openai_file_ids[key_name]
+    # helper to upload one file; runs in worker threads, so it returns errors instead of calling st.*
+    def _upload_to_openai(key_name, file_obj, content_key):
         try:
-            file_obj.seek(0)
-            openai_file = client.files.create(file=file_obj, purpose="user_data")
-            st.session_state.openai_file_ids[key_name] = openai_file.id
-            return openai_file.id
+            cached_id = get_file_id(content_key)
+            if cached_id:
+                try:
+                    client.files.retrieve(cached_id)
+                    return cached_id, None
+                except Exception:
+                    # deleted remotely or owned by another API key; upload again
+                    pass
+            # pass the in-memory bytes directly: no stream position to reset, and the
+            # client's automatic retries resend the same buffer without re-reading the upload
+            openai_file = client.files.create(
+                file=(file_obj.name, file_obj.getvalue(), "application/pdf"), purpose="user_data"
+            )
+            remember_file_id(content_key, openai_file.id)
+            return openai_file.id, None
         except Exception as e:
-            st.error(f"Failed to upload {key_name} to OpenAI: {e}")
-            return None
-
-    with st.spinner("Uploading PDFs to OpenAI..."):
-        file_id_oasis = _upload_to_openai("oasis", oasis_file)
-        file_id_referrals = []
-        for i, rf in enumerate(referral_files):
-            fid = _upload_to_openai(f"referral_{i}", rf)
+            return None, f"Failed to upload {key_name} to OpenAI: {e}"
+
+    uploads = {"oasis": oasis_file}
+    uploads.update({f"referral_{i}": rf for i, rf in enumerate(referral_files)})
+    content_keys = {k: _content_key(f.getvalue()) for k, f in uploads.items()}
+    file_ids = st.session_state.openai_file_ids
+    pending = {k: f for k, f in uploads.items() if content_keys[k] not in file_ids}
+    if pending:
+        # uploads are network-bound, so run them concurrently instead of one round-trip after another
+        with st.spinner("Uploading PDFs to OpenAI..."):
+            with ThreadPoolExecutor(max_workers=min(8, len(pending))) as ex:
+                results = dict(zip(pending, ex.map(
+                    _upload_to_openai, pending, pending.values(), [content_keys[k] for k in pending]
+                )))
+        for key_name, (fid, err) in results.items():
             if fid:
-                file_id_referrals.append(fid)
+                file_ids[content_keys[key_name]] = fid
+            else:
+                st.error(err)
+
+    file_id_oasis = file_ids.get(content_keys["oasis"])
+    file_id_referrals = [file_ids[content_keys[k]] for k in uploads if k != "oasis" and content_keys[k] in file_ids]
 
     if not file_id_oasis or not file_id_referrals:
         st.error("One or more file uploads failed; cannot continue.")
@@ -627,54 +866,102 @@ def main():
 
     st.success(f"Uploaded OASIS (file_id={file_id_oasis}) and {len(file_id_referrals)} referral file(s) to OpenAI")
 
+    # Build the file-input blocks once per set of uploads; both prompts send this exact list
+    file_inputs_key = (file_id_oasis, tuple(file_id_referrals))
+    if st.session_state.get("file_inputs_key") != file_inputs_key:
+        st.session_state["file_inputs"] = [{"type": "input_file", "file_id": file_id_oasis}] + [
+            {"type": "input_file", "file_id": fid} for fid in file_id_referrals
+        ]
+        st.session_state["file_inputs_key"] = file_inputs_key
+    file_inputs = st.session_state["file_inputs"]
+
+    # Bulk re-analyses: queue now, submit as one Batch API job, and collect into the response cache
+    st.sidebar.markdown("**Batch audits**")
+    if st.sidebar.button(f"Submit queued batch ({queued_count()} queued)"):
+        try:
+            batch_id = submit_queued(client)
+            if batch_id:
+                st.sidebar.success(f"Submitted batch {batch_id}")
+            else:
+                st.sidebar.info("Nothing queued.")
+        except Exception as e:
+            st.sidebar.error(f"Batch submit failed: {e}")
+    if pending_batches() and st.sidebar.button("Check batch results"):
+        try:
+            stored, problems = collect_results(client)
+            st.sidebar.success(f"Stored {stored} batch result(s); matching analyses now load from cache.")
+            for problem in problems:
+                st.sidebar.warning(f"{problem}. Requests without a result were queued again.")
+        except Exception as e:
+            st.sidebar.error(f"Batch check failed: {e}")
+
     analyze_key = "analyze_case"
+    if st.button("Queue for batch", key="queue_case"):
+        # custom_id is the analysis cache key, so the collected result is what Analyze looks up
+        queue_key = _analysis_cache_key(file_id_oasis, file_id_referrals)
+        if get_cached(queue_key) is not None:
+            # already analyzed: queuing would pay for the same result again
+            st.info("This case's analysis is already available; click Analyze to load it.")
+        elif queue_request(queue_key, _analysis_request(file_inputs)):
+            st.info("Queued. Submit the batch from the sidebar; results arrive within 24h.")
+        else:
+            st.info("This case is already queued or in a submitted batch.")
     if st.button("Analyze OASIS vs Referral", key=analyze_key):
-        analysis_instruction = (
-            "You are an auditor for OASIS/home health documentation. You have: (a) the OASIS PDF (claims), "
-            "(b) one or more Referral/Supporting PDFs (source of truth), and (c) a policy JSON from Medicare Benefit Policy Manual Chapter 7. "
-            "Task: cross-check the OASIS against referrals, applying the policy JSON. Identify incorrect or insufficient claims in OASIS, cite referral evidence (and policy sections), and suggest concrete fixes.\n\n"
-            "Return EXACTLY one JSON object with keys:\n"
-            "- overall_score: integer 0-100 reflecting compliance\n"
-            "- summary: short overview (1-3 sentences)\n"
-            "- findings: list of objects {status: 'Incorrect'|'Insufficient'|'Aligned', oasis_claim, issue, policy_refs: [strings], citations: [ {file: 'oasis'|'referral'|'policy', page: integer (policy use 0), text: string} ], suggestion: string}\n"
-            "- recommended_actions: short list or string of prioritized remediation steps\n"
-            "Keep citations concise; avoid raw PDF dumps."
-        )
-
-        with st.spinner("Analyzing case with policy JSON..."):
-            try:
-                file_inputs = [{"type": "input_file", "file_id": file_id_oasis}]
-                for fid in file_id_referrals:
-                    file_inputs.append({"type": "input_file", "file_id": fid})
-
-                response = client.responses.create(
-                    model=OPENAI_MODEL,
-                    input=[
-                        {
-                            "role": "user",
-                            "content": [{"type": "input_text", "text": POLICY_JSON}] + file_inputs + [{"type": "input_text", "text": analysis_instruction}],
-                        }
-                    ],
-                )
-                out_text = response.output_text.strip()
-                parsed = None
+        # identical files + policy + prompt: reuse the stored analysis instead of calling the model again
+        analysis_key = _analysis_cache_key(file_id_oasis, file_id_referrals)
+        cached = get_cached(analysis_key)
+        if cached is not None:
+            st.session_state["case_result"] = json.loads(cached)
+            st.session_state["prev_response_id"] = get_cached(f"{analysis_key}:response_id")
+        else:
+            with st.spinner("Analyzing case with policy JSON..."):
                 try:
-                    parsed = json.loads(out_text)
-                except Exception:
-                    s = out_text.find("{")
-                    e = out_text.rfind("}")
-                    if s != -1 and e != -1 and e > s:
-                        try:
-                            parsed = json.loads(out_text[s:e+1])
-                        except Exception:
-                            parsed = None
+                    stream = client.responses.create(**_analysis_request(file_inputs), stream=True)
+                    # stream the output and preview each finding as soon as its JSON object closes
+                    preview = st.empty()
+                    out_text = ""
+                    streamed_findings = []
+                    pos = 0
+                    response_id = None
+                    for event in stream:
+                        if event.type == "response.created":
+                            response_id = event.response.id
+                        if event.type != "response.output_text.delta":
+                            continue
+                        out_text += event.delta
+                        seen = len(streamed_findings)
+                        pos = _stream_findings(out_text, pos, streamed_findings)
+                        if len(streamed_findings) > seen:
+                            preview.markdown(
+                                "\n".join(f"- **{f.get('status', '')}**: {f.get('oasis_claim', '')}" for f in streamed_findings)
+                            )
+                    preview.empty()
+                    out_text = out_text.strip()
+                    parsed = None
+                    try:
+                        # structured output makes this the normal path
+                        parsed = json.loads(out_text)
+                    except Exception:
+                        # fallback for replies wrapped in prose (e.g. a model without json_schema support)
+                        s = out_text.find("{")
+                        e = out_text.rfind("}")
+                        if s != -1 and e != -1 and e > s:
+                            try:
+                                parsed = json.loads(out_text[s:e+1])
+                            except Exception:
+                                parsed = None
 
-                if parsed and isinstance(parsed, dict):
-                    st.session_state["case_result"] = parsed
-                else:
-                    st.error("Could not parse structured JSON from model response.")
-            except Exception as e:
-                st.error(f"Error from LLM: {e}")
+                    if parsed and isinstance(parsed, dict):
+                        st.session_state["case_result"] = parsed
+                        # follow-ups continue from this stored response instead of resending the context
+                        st.session_state["prev_response_id"] = response_id
+                        put_cached(analysis_key, json.dumps(parsed))
+                        if response_id:
+                            put_cached(f"{analysis_key}:response_id", response_id)
+                    else:
+                        st.error("Could not parse structured JSON from model response.")
+                except Exception as e:
+                    st.error(f"Error from LLM: {e}")
 
     case_res = st.session_state.get("case_result")
     if case_res:
@@ -687,43 +974,24 @@ def main():
         if overall_score is not None:
             st.markdown(f"**Overall score:** {overall_score}/100")
         if summary:
-            st.markdown(f"<div class='summary'>{summary}</div>", unsafe_allow_html=True)
-
-        status_badges = {
-            "incorrect": "<span class='badge badge-incorrect'>Incorrect</span>",
-            "insufficient": "<span class='badge badge-insufficient'>Insufficient</span>",
-            "aligned": "<span class='badge badge-correct'>Aligned</span>",
-        }
+            st.markdown(f"<div class='summary'>{_esc(summary)}</div>", unsafe_allow_html=True)
 
         if findings:
-            for f in findings:
-                status = (f.get("status") or "").lower()
-                badge = status_badges.get(status, f"<span class='small-muted'>{status or 'Unknown'}</span>")
-                st.markdown("<div class='card'>", unsafe_allow_html=True)
-                st.markdown(f"{badge} &nbsp; <strong>{f.get('oasis_claim','')}</strong>", unsafe_allow_html=True)
-                if f.get("issue"):
-                    st.write(f"Issue: {f.get('issue')}")
-                if f.get("policy_refs"):
-                    st.write(f"Policy refs: {', '.join(f.get('policy_refs'))}")
-                if f.get("citations"):
-                    st.markdown("**Citations:**")
-                    for c in f.get("citations"):
-                        src = c.get("file", "")
-                        page = c.get("page", "")
-                        text = c.get("text", "")
-                        st.markdown(f"<div class='evidence'><strong>Source:</strong> {src} &nbsp; <span class='small-muted'>Page {page}</span><div>{text}</div></div>", unsafe_allow_html=True)
-                if f.get("suggestion"):
-                    st.write(f"Suggestion: {f.get('suggestion')}")
-                st.markdown("</div>", unsafe_allow_html=True)
+            # one markdown element for all cards instead of several per finding
+            st.markdown("".join(_finding_html(f) for f in findings), unsafe_allow_html=True)
         else:
             st.info("No findings returned.")
 
         if recs:
             st.markdown("**Recommended actions (overall):**")
-            st.write(recs)
+            if isinstance(recs, list):
+                st.markdown("\n".join(f"- {r}" for r in recs))
+            else:
+                st.write(recs)
 
         # PDF export
-        pdf_bytes, pdf_err = _build_pdf_report(case_res)
+        case_hash = _content_key(json.dumps(case_res, sort_keys=True).encode("utf-8"))
+        pdf_bytes, pdf_err = _cached_pdf_report(case_hash, case_res)
         if pdf_bytes:
             st.download_button(
                 "Download audit as PDF",
@@ -748,36 +1016,74 @@ def main():
                 elif client is None:
                     st.warning("OpenAI API key not set - enter it in the sidebar to ask GPT.")
                 else:
-                    follow_instruction = (
-                        "You are a QA and medical coding assistant. Use the OASIS PDF, the referral/supporting PDFs, "
-                        "and the Medicare Chapter 7 policy JSON provided. Answer the user's follow-up about this case. "
+                    follow_preamble = (
+                        "Follow-up: act as a QA and medical coding assistant and answer the user's question about this case. "
                         "Cite sources as {file: oasis|referral|policy, page: number (policy use 0), text: excerpt}. "
                         "Keep the answer concise and actionable.\n\n"
-                        f"Overall score: {overall_score}\n"
-                        f"Summary: {summary}\n"
-                        f"User question: {user_q}\n"
+                    )
+                    # full-context variant, used when there is no stored conversation to continue
+                    follow_instruction = (
+                        follow_preamble
+                        + f"Overall score: {overall_score}\n"
+                        + f"Summary: {summary}\n"
+                        + f"User question: {user_q}\n"
                     )
 
-                    file_inputs = [{"type": "input_file", "file_id": file_id_oasis}]
-                    for fid in file_id_referrals:
-                        file_inputs.append({"type": "input_file", "file_id": fid})
+                    def _follow_up_request(prev_id):
+                        if prev_id:
+                            # the stored conversation already holds the policy, files and analysis
+                            return {
+                                "previous_response_id": prev_id,
+                                "input": [{"role": "user", "content": [{"type": "input_text", "text": follow_preamble + f"User question: {user_q}\n"}]}],
+                            }
+                        return {"input": [{"role": "user", "content": _prompt_content(file_inputs, follow_instruction)}]}
 
-                    try:
-                        response = client.responses.create(
-                            model=OPENAI_MODEL,
-                            input=[
-                                {
-                                    "role": "user",
-                                    "content": [{"type": "input_text", "text": POLICY_JSON}] + file_inputs + [{"type": "input_text", "text": follow_instruction}],
-                                }
-                            ],
-                        )
-                        reply = response.output_text.strip()
-                    except Exception as e:
-                        reply = f"Error from LLM: {e}"
-
-                    st.session_state["case_chat_history"].append({"role": "user", "text": user_q})
-                    st.session_state["case_chat_history"].append({"role": "assistant", "text": reply})
+                    prev_id = st.session_state.get("prev_response_id")
+                    # case/lowercase and whitespace variants of a question share one cache entry
+                    follow_key = cache_key(
+                        "follow_up", OPENAI_MODEL, _policy_prompt_text(), ANALYSIS_SYSTEM_RULES,
+                        file_id_oasis, *sorted(file_id_referrals),
+                        str(overall_score), summary, prev_id or "", " ".join(user_q.lower().split()),
+                    )
+                    reply = get_cached(follow_key)
+                    if reply is not None:
+                        st.session_state["prev_response_id"] = get_cached(f"{follow_key}:response_id")
+                    else:
+                        try:
+                            try:
+                                stream = client.responses.create(model=OPENAI_MODEL, stream=True, **_follow_up_request(prev_id))
+                            except (BadRequestError, NotFoundError):
+                                if not prev_id:
+                                    raise
+                                # stored response expired or belongs to another API key; resend the full context.
+                                # Other errors (rate limits, network) are not retried with the larger request.
+                                stream = client.responses.create(model=OPENAI_MODEL, stream=True, **_follow_up_request(None))
+                            # show the answer as it is generated; the history below renders the final text
+                            live_reply = st.empty()
+                            reply = ""
+                            response_id = None
+                            for event in stream:
+                                if event.type == "response.created":
+                                    response_id = event.response.id
+                                elif event.type == "response.output_text.delta":
+                                    reply += event.delta
+                                    live_reply.markdown(f"**Assistant:** {reply}")
+                            live_reply.empty()
+                            reply = reply.strip()
+                            # an empty reply means a failed or incomplete stream: keep the chain on the last good response
+                            if reply:
+                                st.session_state["prev_response_id"] = response_id
+                                put_cached(follow_key, reply)
+                                if response_id:
+                                    put_cached(f"{follow_key}:response_id", response_id)
+                        except Exception as e:
+                            reply = f"Error from LLM: {e}"
+
+                    if reply:
+                        st.session_state["case_chat_history"].append({"role": "user", "text": user_q})
+                        st.session_state["case_chat_history"].append({"role": "assistant", "text": reply})
+                    else:
+                        st.warning("No answer was returned; please try again.")
 
         if st.session_state.get("case_chat_history"):
             st.markdown("**Discussion history:**")
@@ -3,29 +3,89 @@ import json
 import hashlib
 import hmac
 import secrets
+import tempfile
+import threading
 
 USERS_FILE = os.getenv("USERS_FILE", "users.json")
-# For improved security set PASSWORD_SALT env var in your environment for this app
+# Only used to verify (and then upgrade) records created before per-user scrypt salts
 _PASSWORD_SALT = os.getenv("PASSWORD_SALT", "qa_ai_default_salt_change_this")
 
+# scrypt cost parameters: ~16 MiB and a few tens of ms per hash
+_SCRYPT_N = 2 ** 14
+_SCRYPT_R = 8
+_SCRYPT_P = 1
+
 
 def _hash_password(password: str, salt: str = _PASSWORD_SALT) -> str:
+    # legacy scheme: single SHA-256 over a process-wide salt
     return hashlib.sha256((salt + password).encode("utf-8")).hexdigest()
 
 
-def load_users() -> dict:
-    if not os.path.exists(USERS_FILE):
-        return {}
+def _scrypt(password: str, salt: bytes) -> str:
+    return hashlib.scrypt(
+        password.encode("utf-8"), salt=salt, n=_SCRYPT_N, r=_SCRYPT_R, p=_SCRYPT_P, dklen=32
+    ).hex()
+
+
+def _make_record(password: str) -> dict:
+    salt = secrets.token_bytes(16)
+    return {"algo": "scrypt", "salt": salt.hex(), "pw_hash": _scrypt(password, salt)}
+
+
+# Hashed for unknown usernames so they take as long to reject as wrong passwords
+_DUMMY_SALT = secrets.token_bytes(16)
+
+
+# Parsed USERS_FILE, reused until the file's mtime/size change
+_users_cache = {"stamp": None, "data": None}
+_users_lock = threading.Lock()
+
+
+def _file_stamp():
     try:
-        with open(USERS_FILE, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception:
-        return {}
+        st = os.stat(USERS_FILE)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_users() -> dict:
+    with _users_lock:
+        stamp = _file_stamp()
+        if stamp is None:
+            return {}
+        if stamp != _users_cache["stamp"]:
+            try:
+                with open(USERS_FILE, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except Exception:
+                return {}
+            _users_cache["stamp"], _users_cache["data"] = stamp, data
+        # callers add/replace entries before save_users; keep the cached copy untouched
+        return dict(_users_cache["data"])
 
 
 def save_users(users: dict):
-    with open(USERS_FILE, "w", encoding="utf-8") as f:
-        json.dump(users, f, indent=2)
+    with _users_lock:
+        # write a sibling temp file and rename over USERS_FILE, so a crash mid-write
+        # never leaves a truncated users file behind
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(USERS_FILE)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(users, f, indent=2)
+                f.flush()
+                os.fsync(f.fileno())
+            # mkstemp creates the file 0600; keep the users file's own mode across the rename
+            if os.path.exists(USERS_FILE):
+                os.chmod(tmp_path, os.stat(USERS_FILE).st_mode & 0o7777)
+            else:
+                os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, USERS_FILE)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        _users_cache["stamp"], _users_cache["data"] = _file_stamp(), dict(users)
 
 
 def create_user(username: str, password: str):
@@ -34,22 +94,31 @@ def create_user(username: str, password: str):
     users = load_users()
     if username in users:
         raise ValueError("user already exists")
-    users[username] = {"pw_hash": _hash_password(password)}
+    users[username] = _make_record(password)
     save_users(users)
 
 
 def verify_user(username: str, password: str) -> bool:
     users = load_users()
-    if username not in users:
+    record = users.get(username)
+    if record is None:
+        _scrypt(password, _DUMMY_SALT)
+        return False
+    stored = record.get("pw_hash", "")
+    if record.get("algo") == "scrypt":
+        return hmac.compare_digest(stored, _scrypt(password, bytes.fromhex(record.get("salt", ""))))
+
+    # legacy record: verify with the old scheme, then upgrade it in place
+    if not hmac.compare_digest(stored, _hash_password(password)):
         return False
-    stored = users[username].get("pw_hash", "")
-    provided = _hash_password(password)
-    return hmac.compare_digest(stored, provided)
+    users[username] = _make_record(password)
+    save_users(users)
+    return True
 
 
 def set_password(username: str, password: str):
     users = load_users()
-    users[username] = {"pw_hash": _hash_password(password)}
+    users[username] = _make_record(password)
     save_users(users)
 
 
@@ -0,0 +1,220 @@
+import os
+import io
+import json
+import tempfile
+import threading
+import uuid
+
+from llm_cache import put_cached
+
+# Bulk re-analyses are queued here and sent through the OpenAI Batch API (lower cost, 24h window)
+BATCH_QUEUE_FILE = os.getenv("BATCH_QUEUE_FILE", os.path.join(".cache", "batch_queue.jsonl"))
+# Submitted batches whose results have not been collected yet, with the requests they carry
+BATCH_STATE_FILE = os.getenv("BATCH_STATE_FILE", os.path.join(".cache", "batches.json"))
+
+_FINISHED = {"completed", "failed", "expired", "cancelled"}
+
+# Sessions queue, submit and collect concurrently; every read-modify-write of the two files holds this
+_lock = threading.Lock()
+
+
+def _load_pending() -> list:
+    if not os.path.exists(BATCH_STATE_FILE):
+        return []
+    try:
+        with open(BATCH_STATE_FILE, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+    except Exception:
+        return []
+    # older state files held bare batch ids
+    return [e if isinstance(e, dict) else {"id": e, "requests": []} for e in entries]
+
+
+def _write_atomic(path: str, text: str):
+    # same temp-file-and-rename pattern as auth.save_users: a crash mid-write never
+    # leaves a truncated queue or state file, which would lose the requests it holds
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def _save_pending(entries: list):
+    _write_atomic(BATCH_STATE_FILE, json.dumps(entries, indent=2))
+
+
+def _read_queue() -> list:
+    if not os.path.exists(BATCH_QUEUE_FILE):
+        return []
+    with open(BATCH_QUEUE_FILE, "r", encoding="utf-8") as f:
+        return [line for line in f.read().splitlines() if line.strip()]
+
+
+def _write_queue(lines: list):
+    if not lines:
+        if os.path.exists(BATCH_QUEUE_FILE):
+            os.remove(BATCH_QUEUE_FILE)
+        return
+    _write_atomic(BATCH_QUEUE_FILE, "\n".join(lines) + "\n")
+
+
+def _custom_id(line: str) -> str:
+    return json.loads(line)["custom_id"]
+
+
+def _unique(lines: list) -> list:
+    # the Batch API rejects a whole batch if any custom_id repeats; keep the first of each
+    seen = set()
+    unique = []
+    for line in lines:
+        cid = _custom_id(line)
+        if cid not in seen:
+            seen.add(cid)
+            unique.append(line)
+    return unique
+
+
+def queued_count() -> int:
+    return len(_read_queue())
+
+
+def pending_batches() -> list:
+    # entries still being submitted have no batch id yet
+    return [entry["id"] for entry in _load_pending() if entry.get("id")]
+
+
+def queue_request(custom_id: str, body: dict) -> bool:
+    """Queue one /v1/responses request; `custom_id` is the llm_cache key its result is stored under.
+
+    Returns False (and queues nothing) if that custom_id is already queued or in a submitted batch.
+    """
+    line = json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/responses", "body": body})
+    with _lock:
+        in_flight = {_custom_id(l) for entry in _load_pending() for l in entry["requests"]}
+        if custom_id in in_flight or custom_id in {_custom_id(l) for l in _read_queue()}:
+            return False
+        os.makedirs(os.path.dirname(BATCH_QUEUE_FILE) or ".", exist_ok=True)
+        with open(BATCH_QUEUE_FILE, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    return True
+
+
+def submit_queued(client):
+    """Submit every queued request as one batch. Returns the batch id, or None if nothing is queued.
+
+    The requests move out of the queue into a "submitting" state entry before the upload,
+    so a concurrent submit cannot send them again; they go back to the queue if the
+    upload or batch creation fails, and stay on record with the batch until
+    collect_results sees it finish.
+    """
+    token = uuid.uuid4().hex
+    with _lock:
+        lines = _unique(_read_queue())
+        if not lines:
+            return None
+        _save_pending(_load_pending() + [{"id": None, "submitting": token, "requests": lines}])
+        _write_queue([])
+    try:
+        data = ("\n".join(lines) + "\n").encode("utf-8")
+        input_file = client.files.create(file=("batch_queue.jsonl", io.BytesIO(data), "application/jsonl"), purpose="batch")
+        batch = client.batches.create(
+            input_file_id=input_file.id, endpoint="/v1/responses", completion_window="24h"
+        )
+    except BaseException:
+        with _lock:
+            _save_pending([e for e in _load_pending() if e.get("submitting") != token])
+            _write_queue(_unique(lines + _read_queue()))
+        raise
+    with _lock:
+        _save_pending([
+            {"id": batch.id, "requests": lines} if e.get("submitting") == token else e
+            for e in _load_pending()
+        ])
+    return batch.id
+
+
+def _output_text(body: dict) -> str:
+    # raw Responses API body: concatenate the output_text parts of its message items
+    parts = []
+    for item in body.get("output") or []:
+        for content in item.get("content") or []:
+            if content.get("type") == "output_text":
+                parts.append(content.get("text", ""))
+    return "".join(parts)
+
+
+def _store_output(client, output_file_id: str) -> set:
+    """Store every successful result in an output file; return the custom_ids stored."""
+    stored = set()
+    for line in client.files.content(output_file_id).text.splitlines():
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if response.get("status_code") != 200:
+            continue
+        body = response.get("body") or {}
+        try:
+            parsed = json.loads(_output_text(body))
+        except ValueError:
+            continue
+        if isinstance(parsed, dict):
+            key = record["custom_id"]
+            put_cached(key, json.dumps(parsed))
+            if body.get("id"):
+                put_cached(f"{key}:response_id", body["id"])
+            stored.add(key)
+    return stored
+
+
+def _batch_problem(batch) -> str:
+    """Describe a finished batch that did not fully succeed, or return "" if it did."""
+    if batch.status == "completed" and not batch.error_file_id:
+        return ""
+    message = f"Batch {batch.id} {batch.status}"
+    errors = getattr(getattr(batch, "errors", None), "data", None) or []
+    if errors:
+        message += ": " + "; ".join(e.message for e in errors if getattr(e, "message", None))
+    if batch.error_file_id:
+        message += f" (error file {batch.error_file_id})"
+    return message
+
+
+def collect_results(client) -> tuple:
+    """Store results of finished batches in llm_cache.
+
+    Returns (stored, problems): how many results were stored, and a message for each
+    finished batch that failed, expired, was cancelled or had failed requests. Requests
+    without a stored result are queued again, so they can be resubmitted.
+    """
+    stored = 0
+    problems = []
+    finished = set()
+    requeue = []
+    for entry in _load_pending():
+        if not entry.get("id"):
+            continue
+        batch = client.batches.retrieve(entry["id"])
+        if batch.status not in _FINISHED:
+            continue
+        # expired and cancelled batches still carry the results of requests that finished
+        done = _store_output(client, batch.output_file_id) if batch.output_file_id else set()
+        stored += len(done)
+        problem = _batch_problem(batch)
+        if problem:
+            problems.append(problem)
+        requeue.extend(l for l in entry["requests"] if _custom_id(l) not in done)
+        finished.add(entry["id"])
+    with _lock:
+        # re-read: another session may have submitted a batch meanwhile
+        _save_pending([e for e in _load_pending() if e.get("id") not in finished])
+        _write_queue(_unique(_read_queue() + requeue))
+    return stored, problems
@@ -0,0 +1,44 @@
+import os
+import json
+import tempfile
+import threading
+
+# Maps uploaded file content hashes to OpenAI file ids so repeat audits skip re-uploading
+OPENAI_FILE_CACHE = os.getenv("OPENAI_FILE_CACHE", os.path.join(".cache", "openai_files.json"))
+
+# Upload workers read and write the sidecar concurrently; this module is imported once,
+# so the lock is shared across Streamlit reruns and sessions
+_lock = threading.Lock()
+
+
+def _load() -> dict:
+    if not os.path.exists(OPENAI_FILE_CACHE):
+        return {}
+    try:
+        with open(OPENAI_FILE_CACHE, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except Exception:
+        return {}
+
+
+def get_file_id(content_key: str):
+    """Return the OpenAI file id recorded for `content_key`, or None."""
+    with _lock:
+        return _load().get(content_key)
+
+
+def remember_file_id(content_key: str, file_id: str):
+    with _lock:
+        cache = _load()
+        cache[content_key] = file_id
+        os.makedirs(os.path.dirname(OPENAI_FILE_CACHE) or ".", exist_ok=True)
+        # same temp-file-and-rename pattern as auth.save_users: readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(OPENAI_FILE_CACHE)), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_path, OPENAI_FILE_CACHE)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
@@ -0,0 +1,38 @@
+import os
+import hashlib
+import sqlite3
+from contextlib import closing
+
+# Persistent cache of LLM responses so identical requests survive reruns and restarts
+LLM_CACHE_DB = os.getenv("LLM_CACHE_DB", os.path.join(".cache", "llm_responses.db"))
+
+
+def _connect() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(LLM_CACHE_DB) or ".", exist_ok=True)
+    conn = sqlite3.connect(LLM_CACHE_DB, timeout=10)
+    conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+    return conn
+
+
+def cache_key(*parts: str) -> str:
+    """Return a stable key for the given request parts (order matters)."""
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_cached(key: str):
+    """Return the cached value for `key`, or None on a miss or unreadable cache."""
+    try:
+        with closing(_connect()) as conn:
+            row = conn.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+    except sqlite3.Error:
+        return None
+    return row[0] if row else None
+
+
+def put_cached(key: str, value: str):
+    try:
+        with closing(_connect()) as conn, conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, value) VALUES (?, ?)", (key, value))
+    except sqlite3.Error:
+        # caching is best-effort; never fail the request because of it
+        pass
@@ -1,6 +1,111 @@
+import heapq
 import re
+import threading
+from bisect import bisect_right
+from operator import itemgetter
 from typing import List, Dict
 
+import pypdfium2 as pdfium
+
+# PDFium is not thread-safe, even across separate documents, and Streamlit runs every
+# session in its own thread: all pdfium calls in this process go through this lock
+PDFIUM_LOCK = threading.Lock()
+
+# Common words that would match nearly every sentence; ignored as search keywords
+STOPWORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "but", "by", "for", "from", "has", "have", "he",
+    "her", "his", "in", "is", "it", "its", "of", "on", "or", "she", "that", "the", "their",
+    "they", "this", "to", "was", "were", "what", "when", "which", "who", "with",
+})
+# Keywords match as substrings, so shorter ones (e.g. "pt" in "accepted") mostly add noise
+MIN_KEYWORD_LEN = 3
+
+_WORD_RE = re.compile(r"\w+")
+_SENT_RE = re.compile(r'(?<=[.!?])\s+')
+# Same boundaries as _SENT_RE (each match ends where a _SENT_RE match ends), but a
+# leading character class lets re skip ahead to candidates instead of trying a
+# lookbehind at every position; ~1.7x faster for building sentence indexes.
+_SENT_END_RE = re.compile(r'[.!?]\s+')
+
+
+def page_text(pdf, index: int) -> str:
+    """Return the text of one page of a pdfium document, or "" if extraction fails.
+
+    The caller must hold PDFIUM_LOCK.
+    """
+    try:
+        return pdf[index].get_textpage().get_text_range() or ""
+    except Exception:
+        return ""
+
+
+def extract_page_texts(file_bytes: bytes) -> List[str]:
+    """Return the text of every page of a PDF, in page order.
+
+    pdfium extracts a page in well under a millisecond, so one pass under PDFIUM_LOCK beats
+    a process pool at any realistic size: worker start-up alone costs more than the work.
+    """
+    with PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(file_bytes)
+        try:
+            return [page_text(pdf, i) for i in range(len(pdf))]
+        finally:
+            # closing the document also closes its pages and text pages, inside the lock
+            pdf.close()
+
+
+def build_page_index(page_texts: List[str]) -> tuple:
+    """Return (joined, offsets): all pages lowercased and joined by "\x00", plus each page's start offset.
+
+    One C-level str.find over `joined` replaces a Python loop over pages; a hit maps
+    back to its page with a bisect on `offsets`.
+    """
+    lowered = [t.lower() for t in page_texts]
+    offsets = []
+    pos = 0
+    for t in lowered:
+        offsets.append(pos)
+        pos += len(t) + 1
+    return "\x00".join(lowered), offsets
+
+
+def sentence_index(joined: str, offsets: List[int]) -> tuple:
+    """Return (sentence_starts, page_first_sentence) for a page index from build_page_index.
+
+    sentence_starts holds the offset in `joined` of every sentence, in page order, split
+    the same way as _SENT_RE.split(page_text); page_first_sentence[p] is the position in
+    sentence_starts of page p's first sentence.
+    """
+    sentence_starts = []
+    page_first_sentence = []
+    page_ends = offsets[1:] + [len(joined) + 1]
+    for start, next_start in zip(offsets, page_ends):
+        page_first_sentence.append(len(sentence_starts))
+        sentence_starts.append(start)
+        sentence_starts.extend(m.end() for m in _SENT_END_RE.finditer(joined, start, next_start - 1))
+    return sentence_starts, page_first_sentence
+
+
+def _sentence_keyword_counts(joined: str, sentence_starts: List[int], keywords) -> Dict[int, int]:
+    """Map sentence index -> number of distinct keywords it contains, for sentences with any.
+
+    Each keyword is located with C-level str.find over the whole joined buffer and hits
+    are bucketed by sentence with a bisect, instead of testing every keyword against
+    every sentence.
+    """
+    counts = {}
+    last = len(sentence_starts) - 1
+    for kw in keywords:
+        pos = joined.find(kw)
+        while pos != -1:
+            idx = bisect_right(sentence_starts, pos) - 1
+            counts[idx] = counts.get(idx, 0) + 1
+            if idx == last:
+                break
+            # one hit per sentence is enough; resume at the next sentence
+            pos = joined.find(kw, sentence_starts[idx + 1])
+    return counts
+
 
 def find_context_matches(pdfs: Dict[str, dict], context: str, top_k: int = 5) -> List[dict]:
     """Search PDF page texts for sentences that match a given context string.
@@ -11,13 +116,15 @@ def find_context_matches(pdfs: Dict[str, dict], context: str, top_k: int = 5) ->
     if not context or not pdfs:
         return []
 
-    # simple keyword extraction from context
-    keywords = re.findall(r"\w+", context.lower())
+    # simple keyword extraction from context: distinct words, minus stopwords and very short words
+    keywords = frozenset(
+        kw for kw in _WORD_RE.findall(context.lower()) if len(kw) >= MIN_KEYWORD_LEN and kw not in STOPWORDS
+    )
     if not keywords:
         return []
 
-    results = []
-
+    # first make sure every PDF has its cached text index
+    prepared = []
     for pdf_name, info in pdfs.items():
         page_texts = info.get("page_texts")
 
@@ -26,36 +133,43 @@ def find_context_matches(pdfs: Dict[str, dict], context: str, top_k: int = 5) ->
             reader = info.get("reader")
             if not reader:
                 continue
-            page_texts = []
-            for i in range(info.get("pages", 0)):
-                try:
-                    text = reader.pages[i].extract_text() or ""
-                except Exception:
-                    text = ""
-                page_texts.append(text)
+            with PDFIUM_LOCK:
+                page_texts = [page_text(reader, i) for i in range(info.get("pages", 0))]
             info["page_texts"] = page_texts
 
-        for page_idx, text in enumerate(page_texts):
-            if not text:
-                continue
+        # lowercased text, sentence boundaries and split sentences are cached on `info`,
+        # so repeated searches over the same PDF only pay for the keyword scan
+        if "joined_lower" not in info:
+            info["joined_lower"], info["page_offsets"] = build_page_index(page_texts)
+        if "sentence_starts" not in info:
+            info["sentence_starts"], info["page_first_sentence"] = sentence_index(
+                info["joined_lower"], info["page_offsets"]
+            )
+        prepared.append((pdf_name, info))
+
+    results = []
+    for pdf_name, info in prepared:
+        # the scan is a few ms per PDF; a process pool's start-up and pickling would cost more
+        counts = _sentence_keyword_counts(info["joined_lower"], info["sentence_starts"], keywords)
+        page_texts = info["page_texts"]
+        page_first_sentence = info["page_first_sentence"]
+        # only pages with at least one hit get sentence-split
+        page_sentences = info.setdefault("page_sentences", {})
+        for idx in sorted(counts):
+            page_idx = bisect_right(page_first_sentence, idx) - 1
+            sentences = page_sentences.get(page_idx)
+            if sentences is None:
+                # Split into sentences heuristically
+                sentences = page_sentences[page_idx] = _SENT_RE.split(page_texts[page_idx])
+            sent = sentences[idx - page_first_sentence[page_idx]]
+            # score: occurrences normalized by sentence length (words)
+            words = len(sent.split())
+            score = counts[idx] / (words + 1)
+            results.append((score, pdf_name, page_idx, sent))
 
-            # Split into sentences heuristically
-            sentences = re.split(r'(?<=[.!?])\s+', text)
-            for sent in sentences:
-                low = sent.lower()
-                # count how many keywords occur in the sentence
-                count = sum(1 for kw in keywords if kw in low)
-                if count > 0:
-                    # score: occurrences normalized by sentence length (words)
-                    words = len(sent.split())
-                    score = count / (words + 1)
-                    results.append({
-                        "pdf_name": pdf_name,
-                        "page": page_idx,
-                        "score": score,
-                        "text": sent.strip()
-                    })
-
-    # sort by score and truncate
-    results.sort(key=lambda x: x["score"], reverse=True)
-    return results[:top_k]
+    # top_k selection is O(R log k); ties keep scan order, same as a stable sort
+    top = heapq.nlargest(top_k, results, key=itemgetter(0))
+    return [
+        {"pdf_name": pdf_name, "page": page_idx, "score": score, "text": sent.strip()}
+        for score, pdf_name, page_idx, sent in top
+    ]